@@ -3,10 +3,24 @@
 # Κουμπί 1: Εκτέλεση Βήματα 1–6  → αποθηκεύει στη μνήμη (session) το αρχείο Step6
 # Κουμπί 2: Τελική κατανομή (Βήματα 7–8) → ΧΡΗΣΙΜΟΠΟΙΕΙ ΜΟΝΟ το Step6 από τη μνήμη
 #  - Το Κουμπί 2 είναι απενεργοποιημένο μέχρι να ολοκληρωθεί το Κουμπί 1.
+# Εγκατάσταση: pip install streamlit pandas openpyxl xlsxwriter
+#  - Προαιρετικά: pip install python-calamine (ταχύτερη ανάγνωση .xlsx, pandas >= 2.2)
 
 import streamlit as st
-import tempfile, os, importlib.util, sys
+import tempfile, os, io, importlib.util, sys
 from pathlib import Path
+# Προ-φόρτωση των βαριών βιβλιοθηκών που χρησιμοποιούν τα step modules: το κόστος
+# πληρώνεται μία φορά στην εκκίνηση της διεργασίας και όχι στο πρώτο κλικ.
+# Οι Excel engines είναι προαιρετικοί: αν λείπουν, το app ξεκινά κανονικά.
+import pandas  # noqa: F401
+try:
+    import openpyxl  # noqa: F401
+except ImportError:
+    pass
+try:
+    import xlsxwriter  # noqa: F401
+except ImportError:
+    pass
 
 st.set_page_config(page_title="Wrapper 1–6 & 7–8 (guided)", layout="centered")
 
@@ -31,16 +45,34 @@ st.caption("**Ροή:** Πρώτα 1️⃣ (παράγει Step6), μετά 2️
 WORKDIR = Path(__file__).parent
 
 def _import_by_path(modname: str, path: Path):
+    # Το Streamlit ξανατρέχει το script σε κάθε κλικ, οπότε η cache ζει στο sys.modules:
+    # επαναχρησιμοποιούμε το module αν είναι από το ίδιο αρχείο και δεν έχει αλλάξει (mtime).
+    mtime = path.stat().st_mtime
+    mod = sys.modules.get(modname)
+    if mod is not None and getattr(mod, "__file__", None) == str(path) and getattr(mod, "_wrapper_mtime", None) == mtime:
+        return mod
     spec = importlib.util.spec_from_file_location(modname, str(path))
     mod = importlib.util.module_from_spec(spec)
     sys.modules[modname] = mod
     spec.loader.exec_module(mod)
+    mod._wrapper_mtime = mtime
     return mod
 
+# Τα paths που βρέθηκαν κρατιούνται ανά process: το st.cache_resource επιβιώνει των reruns,
+# σε αντίθεση με ένα lru_cache μέσα στο script.
+@st.cache_resource(show_spinner=False)
+def _found_paths() -> dict:
+    return {}
+
 def _first_existing(*names: str) -> Path | None:
+    # Μόνο τα ευρήματα μπαίνουν στην cache: ένα αρχείο που προστίθεται αργότερα βρίσκεται στο επόμενο κλικ
+    found = _found_paths()
+    if names in found:
+        return found[names]
     for n in names:
         p = WORKDIR / n
         if p.exists():
+            found[names] = p
             return p
     return None
 
@@ -68,19 +100,18 @@ if run_1_6:
     with st.spinner("Τρέχουν τα Βήματα 1→6 ..."):
         with tempfile.TemporaryDirectory() as tmpd:
             tmpd = Path(tmpd)
-            in_path = tmpd / "STEP1_input.xlsx"
+            # Το STEP1 περνά στον exporter ως buffer (pd.ExcelFile δέχεται BytesIO), χωρίς αρχείο
+            in_buf = io.BytesIO(uploaded_step1.getvalue())
             out_1_5 = tmpd / "STEP1_to_5_PER_SCENARIO_MIN.xlsx"
-            out_1_6 = tmpd / "STEP1_to_6_PER_SCENARIO_MIN.xlsx"  # consistent filename
-
-            with open(in_path, "wb") as f:
-                f.write(uploaded_step1.read())
+            out_1_6_name = "STEP1_to_6_PER_SCENARIO_MIN.xlsx"  # consistent filename
+            out_1_6 = io.BytesIO()  # το Step6 γράφεται κατευθείαν στη μνήμη, όχι στον δίσκο
 
             # 1→5
             exp = _import_by_path("exporter_min", exporter_path)
             if hasattr(exp, "build_step1_4_per_scenario"):
-                exp.build_step1_4_per_scenario(str(in_path), str(out_1_5), pick_step4="best")
+                exp.build_step1_4_per_scenario(in_buf, str(out_1_5), pick_step4="best")
             elif hasattr(exp, "build_step1_5_per_scenario"):
-                exp.build_step1_5_per_scenario(str(in_path), str(out_1_5), pick_step4="best")
+                exp.build_step1_5_per_scenario(in_buf, str(out_1_5), pick_step4="best")
             else:
                 st.error("Δεν βρέθηκε συνάρτηση build_step1_4_per_scenario στο exporter.")
                 st.stop()
@@ -88,15 +119,15 @@ if run_1_6:
             # 6
             m6 = _import_by_path("step6_mod", step6_path)
             if hasattr(m6, "export_single_noaudit"):
-                m6.export_single_noaudit(str(out_1_5), str(out_1_6))
+                m6.export_single_noaudit(str(out_1_5), out_1_6)
             else:
                 st.error("Στο step6_compliant.py δεν βρέθηκε export_single_noaudit(...).")
                 st.stop()
 
             # Store to session
-            step6_bytes = open(out_1_6, "rb").read()
+            step6_bytes = out_1_6.getvalue()
             st.session_state["step6_bytes"] = step6_bytes
-            st.session_state["step6_name"] = out_1_6.name
+            st.session_state["step6_name"] = out_1_6_name
 
             st.success("✅ Ολοκλήρωση Βήματος 1–6! Το αποτέλεσμα αποθηκεύτηκε για χρήση στο Κουμπί 2.")
             st.download_button(
@@ -130,26 +161,22 @@ if run_7_8:
         st.stop()
 
     with st.spinner("Τρέχουν τα Βήματα 7→8 ..."):
-        with tempfile.TemporaryDirectory() as tmpd:
-            tmpd = Path(tmpd)
-            in_path = tmpd / st.session_state.get("step6_name", "STEP1_to_6_PER_SCENARIO_MIN.xlsx")
-            out_best = tmpd / "BEST_ONLY_EXPORT.xlsx"
-
-            with open(in_path, "wb") as f:
-                f.write(st.session_state["step6_bytes"])
-
-            step8 = _import_by_path("step8_mod", step8_path)
-            if hasattr(step8, "build_best_only_workbook"):
-                step8.build_best_only_workbook(str(in_path), str(step7_path), str(out_best), seed=int(seed_val) if seed_val else None)
-            else:
-                st.error("Στο step8.py δεν βρέθηκε build_best_only_workbook(...).")
-                st.stop()
-
-            best_bytes = open(out_best, "rb").read()
-            st.success("🎉 Έτοιμο το τελικό (Βήματα 7–8)!")
-            st.download_button(
-                "⬇️ Κατέβασε BEST_ONLY_EXPORT.xlsx",
-                data=best_bytes,
-                file_name="BEST_ONLY_EXPORT.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
+        # Το Step6 διαβάζεται κατευθείαν από τη μνήμη (pd.ExcelFile δέχεται BytesIO)
+        in_buf = io.BytesIO(st.session_state["step6_bytes"])
+        out_best = io.BytesIO()  # το τελικό αρχείο δεν περνά από τον δίσκο
+
+        step8 = _import_by_path("step8_mod", step8_path)
+        if hasattr(step8, "build_best_only_workbook"):
+            step8.build_best_only_workbook(in_buf, str(step7_path), out_best, seed=int(seed_val) if seed_val else None)
+        else:
+            st.error("Στο step8.py δεν βρέθηκε build_best_only_workbook(...).")
+            st.stop()
+
+        best_bytes = out_best.getvalue()
+        st.success("🎉 Έτοιμο το τελικό (Βήματα 7–8)!")
+        st.download_button(
+            "⬇️ Κατέβασε BEST_ONLY_EXPORT.xlsx",
+            data=best_bytes,
+            file_name="BEST_ONLY_EXPORT.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
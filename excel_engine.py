@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Επιλογή engine ανάγνωσης/εγγραφής Excel, κοινή για την εφαρμογή και τα scripts των βημάτων
+"""
+import functools
+import importlib.util
+import re
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Κείμενα όπως γράφονται: χωρίς ανίχνευση URL/τύπων/αριθμών σε κάθε string κελί (π.χ. ΟΝΟΜΑ)
+XLSXWRITER_OPTIONS = {'strings_to_urls': False, 'strings_to_formulas': False, 'strings_to_numbers': False}
+
+
+@functools.lru_cache(maxsize=1)
+def excel_read_engine() -> Optional[str]:
+    """calamine (Rust reader, pandas ≥ 2.2) αν υπάρχει, αλλιώς None (ο προεπιλεγμένος engine του pandas)"""
+    pandas_version = tuple(int(part) for part in re.findall(r"\d+", pd.__version__)[:2])
+    return "calamine" if CALAMINE_AVAILABLE and pandas_version >= (2, 2) else None
+
+
+@functools.lru_cache(maxsize=1)
+def excel_writer_engine() -> str:
+    """xlsxwriter αν είναι εγκατεστημένο (ταχύτερη σειριοποίηση), αλλιώς openpyxl"""
+    # Χωρίς constant_memory: το to_excel του pandas γράφει ανά στήλη και
+    # σε αυτή τη λειτουργία το xlsxwriter κρατά μόνο την τρέχουσα γραμμή
+    return 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') is not None else 'openpyxl'
+
+
+def excel_writer_kwargs() -> Dict[str, Any]:
+    """Παράμετροι pd.ExcelWriter για τον διαθέσιμο engine (με τα XLSXWRITER_OPTIONS στο xlsxwriter)"""
+    engine = excel_writer_engine()
+    if engine == 'xlsxwriter':
+        return {'engine': engine, 'engine_kwargs': {'options': XLSXWRITER_OPTIONS}}
+    return {'engine': engine}
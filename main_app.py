@@ -8,68 +8,63 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import io
-import tempfile
+import hashlib
+import importlib
+import importlib.util
 import traceback
-from pathlib import Path
+import zipfile
 from typing import Dict, Optional, Any, List, Tuple
 import sys
 import re
 
-# Import των υπαρχόντων modules με error handling
-try:
-    from step1_immutable import create_immutable_step1, Step1Results, validate_step1_immutability
-    STEP1_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής step1_immutable: {e}")
-    STEP1_AVAILABLE = False
-
-try:
-    from main_step2_with_lock import run_step2_with_lock
-    STEP2_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής main_step2_with_lock: {e}")
-    STEP2_AVAILABLE = False
-
-try:
-    from step3_amivaia_filia_FIXED import apply_step3_to_dataframe
-    STEP3_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής step3_amivaia_filia_FIXED: {e}")
-    STEP3_AVAILABLE = False
+# Engines ανάγνωσης/εγγραφής Excel (calamine / xlsxwriter αν υπάρχουν), κοινοί με τα scripts των βημάτων
+from excel_engine import excel_read_engine, excel_writer_kwargs
 
-try:
-    from step4_corrected import run_step4_complete
-    STEP4_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής step4_corrected: {e}")
-    STEP4_AVAILABLE = False
+# Lazy φόρτωση των step modules: ελέγχουμε μόνο ότι υπάρχουν (find_spec, χωρίς εκτέλεση)
+# και τα εισάγουμε την πρώτη φορά που χρειάζεται κάποιο όνομά τους.
+_STEP_EXPORTS = {
+    'create_immutable_step1': 'step1_immutable',
+    'run_step2_with_lock_df': 'main_step2_with_lock',
+    'apply_step3_to_dataframe': 'step3_amivaia_filia_FIXED',
+    'run_step4_complete': 'step4_corrected',
+    'apply_step5_to_all_scenarios': 'step5_enhanced',
+    'apply_step6_to_step5_scenarios': 'step6_compliant',
+    'pick_best_scenario': 'step7_fixed_final',
+    'score_to_dataframe': 'step7_fixed_final',
+}
+_LOADED_EXPORTS: Dict[str, Any] = {}
 
-try:
-    from step5_enhanced import apply_step5_to_all_scenarios
-    STEP5_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής step5_enhanced: {e}")
-    STEP5_AVAILABLE = False
+def _lazy_step(name: str) -> Any:
+    """Επιστρέφει το όνομα `name` από το step module του, εισάγοντάς το στην πρώτη χρήση"""
+    if name not in _LOADED_EXPORTS:
+        # Το import_module εισάγει το module μία φορά ανά process (sys.modules επιβιώνει των reruns)
+        module = importlib.import_module(_STEP_EXPORTS[name])
+        _LOADED_EXPORTS[name] = getattr(module, name)
+    return _LOADED_EXPORTS[name]
 
-try:
-    from step6_compliant import apply_step6_to_step5_scenarios
-    STEP6_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής step6_compliant: {e}")
-    STEP6_AVAILABLE = False
+def _module_available(module_name: str) -> bool:
+    """Έλεγχος ύπαρξης module χωρίς να εκτελεστεί ο κώδικάς του"""
+    if importlib.util.find_spec(module_name) is not None:
+        return True
+    st.error(f"Σφάλμα εισαγωγής {module_name}: No module named '{module_name}'")
+    return False
 
-try:
-    from step7_fixed_final import pick_best_scenario, score_to_dataframe, score_one_scenario_auto
-    STEP7_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Σφάλμα εισαγωγής step7_fixed_final: {e}")
-    STEP7_AVAILABLE = False
+STEP1_AVAILABLE = _module_available('step1_immutable')
+STEP2_AVAILABLE = _module_available('main_step2_with_lock')
+STEP3_AVAILABLE = _module_available('step3_amivaia_filia_FIXED')
+STEP4_AVAILABLE = _module_available('step4_corrected')
+STEP5_AVAILABLE = _module_available('step5_enhanced')
+STEP6_AVAILABLE = _module_available('step6_compliant')
+STEP7_AVAILABLE = _module_available('step7_fixed_final')
 
 try:
-    from statistics_generator import generate_statistics_table, export_statistics_to_excel
-    STATS_AVAILABLE = True
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
 except ImportError:
-    STATS_AVAILABLE = False
+    ARROW_AVAILABLE = False
+
+# Προαιρετικό module στατιστικών: μόνο έλεγχος ύπαρξης, χωρίς εκτέλεση του κώδικά του
+STATS_AVAILABLE = importlib.util.find_spec('statistics_generator') is not None
 
 st.set_page_config(
     page_title="Κατανομή Μαθητών σε Τμήματα",
@@ -77,6 +72,41 @@ st.set_page_config(
     layout="wide"
 )
 
+# Τύποι των κανονικοποιημένων στηλών: κατηγορίες με σταθερές τιμές (Α/Κ, Ν/Ο) αντί για
+# Python strings, ώστε οι συγκρίσεις/μετρήσεις στα επόμενα βήματα να γίνονται σε κωδικούς.
+YES_NO_DTYPE = pd.CategoricalDtype(['Ν', 'Ο'])
+LOAD_DTYPES = {
+    'ΦΥΛΟ': pd.CategoricalDtype(['Α', 'Κ']),
+    'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ': YES_NO_DTYPE,
+    'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ': YES_NO_DTYPE,
+    'ΟΝΟΜΑ': 'string',
+}
+
+# Παραλλαγές ονομάτων στηλών → κανονικό όνομα, με σειρά προτεραιότητας.
+# Κάθε ομάδα γίνεται ένα precompiled regex (μία αναζήτηση ανά στήλη αντί για N ελέγχους `in`).
+CANON_PATTERNS = [
+    (re.compile('|'.join(map(re.escape, variants))), target)
+    for variants, target in [
+        (['ΟΝΟΜΑ', 'ONOMA', 'NAME', 'ΜΑΘΗΤΗΣ', 'ΜΑΘΗΤΡΙΑ', 'STUDENT'], 'ΟΝΟΜΑ'),
+        (['ΦΥΛΟ', 'FYLO', 'GENDER', 'SEX'], 'ΦΥΛΟ'),
+        (['ΓΝΩΣΗ', 'ΓΝΩΣΕΙΣ', 'ΕΛΛΗΝΙΚ', 'ELLINIK', 'GREEK'], 'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ'),
+        (['ΠΑΙΔΙ', 'PAIDI', 'ΕΚΠΑΙΔΕΥΤΙΚ', 'EKPEDEFTIK', 'TEACHER', 'ΔΑΣΚΑΛ'], 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'),
+        (['ΦΙΛΟΙ', 'FILOI', 'FRIEND'], 'ΦΙΛΟΙ'),
+        (['ΖΩΗΡ', 'ZOIR', 'ACTIVE', 'ENERGY'], 'ΖΩΗΡΟΣ'),
+        (['ΙΔΙΑΙΤΕΡΟΤΗΤ', 'IDIETEROTIT', 'SPECIAL'], 'ΙΔΙΑΙΤΕΡΟΤΗΤΑ'),
+        (['ΣΥΓΚΡΟΥΣ', 'SYGKROUS', 'CONFLICT'], 'ΣΥΓΚΡΟΥΣΗ'),
+    ]
+]
+
+# Τιμές (μετά από strip/upper) που αναγνωρίζονται ως Κ (φύλο) και Ν (boolean στήλες)
+GIRL_TOKENS = ('Κ', 'ΚΟΡΙΤΣΙ', 'ΚΟΡΙΤΣΙΟΥ', 'GIRL', 'FEMALE', 'F')
+YES_TOKENS = ('Ν', 'ΝΑΙ', 'YES', 'Y', '1', 'TRUE', 'T')
+
+def _normalize_flag(series: pd.Series, true_tokens: Tuple[str, ...], true_value: str, false_value: str) -> np.ndarray:
+    """Δίτιμη κανονικοποίηση: ένα hash isin + np.where αντί για map + fillna"""
+    is_true = series.astype(str).str.strip().str.upper().isin(true_tokens).to_numpy()
+    return np.where(is_true, true_value, false_value).astype(object)
+
 def init_session_state():
     """Αρχικοποίηση session state"""
     defaults = {
@@ -93,84 +123,102 @@ def init_session_state():
         if key not in st.session_state:
             st.session_state[key] = default_value
 
-def safe_load_data(uploaded_file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
-    """Ασφαλής φόρτωση και κανονικοποίηση δεδομένων"""
+def _uploaded_file_key(uploaded_file) -> str:
+    """Hash των bytes ενός upload, υπολογισμένο μία φορά ανά αρχείο και κρατημένο στο session.
+    
+    Χρησιμοποιείται ως κλειδί από τις cached συναρτήσεις, ώστε να μη χρειάζεται η καθεμία
+    να ξανακάνει hash ολόκληρο το περιεχόμενο σε κάθε rerun.
+    """
+    file_id = getattr(uploaded_file, 'file_id', None)
+    digests = st.session_state.setdefault('upload_digests', {})
+    if file_id is None or file_id not in digests:
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if file_id is None:
+            return digest
+        digests[file_id] = digest
+    return digests[file_id]
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _parse_bytes(file_key: str, _raw: bytes, name: str) -> Tuple[Optional[pd.DataFrame], Optional[str], Dict[str, Any]]:
+    """Ανάγνωση και κανονικοποίηση ενός upload, cached με κλειδί το hash του (το _raw δεν γίνεται hash).
+    
+    Returns:
+        (DataFrame, μήνυμα σφάλματος, debug πληροφορίες για εμφάνιση εκτός cache)
+    """
+    debug_info: Dict[str, Any] = {}
     try:
-        if uploaded_file.name.endswith('.xlsx'):
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
-        elif uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, encoding='utf-8')
+        if name.endswith('.xlsx'):
+            df = pd.read_excel(io.BytesIO(_raw), engine=excel_read_engine())
+        elif name.endswith('.csv'):
+            df = pd.read_csv(io.BytesIO(_raw), encoding='utf-8')
         else:
-            return None, "Μη υποστηριζόμενο format αρχείου"
+            return None, "Μη υποστηριζόμενο format αρχείου", debug_info
         
-        # Debug info
-        if st.session_state.debug_mode:
-            st.write("**DEBUG - Αρχικές στήλες:**", list(df.columns))
-            st.write("**DEBUG - Shape:**", df.shape)
+        debug_info['columns'] = list(df.columns)
+        debug_info['shape'] = df.shape
         
         # Κανονικοποίηση στηλών
         rename_map = {}
         for col in df.columns:
-            col_str = str(col).strip().upper()
-            col_clean = col_str.replace(' ', '_').replace('-', '_')
+            col_clean = str(col).strip().upper().replace(' ', '_').replace('-', '_')
             
-            # Αναζήτηση με περισσότερες παραλλαγές
-            if any(x in col_clean for x in ['ΟΝΟΜΑ', 'ONOMA', 'NAME', 'ΜΑΘΗΤΗΣ', 'ΜΑΘΗΤΡΙΑ', 'STUDENT']):
-                rename_map[col] = 'ΟΝΟΜΑ'
-            elif any(x in col_clean for x in ['ΦΥΛΟ', 'FYLO', 'GENDER', 'SEX']):
-                rename_map[col] = 'ΦΥΛΟ'
-            elif any(pattern in col_clean for pattern in ['ΓΝΩΣΗ', 'ΓΝΩΣΕΙΣ', 'ΕΛΛΗΝΙΚ', 'ELLINIK', 'GREEK']):
-                rename_map[col] = 'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ'
-            elif any(pattern in col_clean for pattern in ['ΠΑΙΔΙ', 'PAIDI', 'ΕΚΠΑΙΔΕΥΤΙΚ', 'EKPEDEFTIK', 'TEACHER', 'ΔΑΣΚΑΛ']):
-                rename_map[col] = 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'
-            elif any(x in col_clean for x in ['ΦΙΛΟΙ', 'FILOI', 'FRIEND']):
-                rename_map[col] = 'ΦΙΛΟΙ'
-            elif any(x in col_clean for x in ['ΖΩΗΡ', 'ZOIR', 'ACTIVE', 'ENERGY']):
-                rename_map[col] = 'ΖΩΗΡΟΣ'
-            elif any(x in col_clean for x in ['ΙΔΙΑΙΤΕΡΟΤΗΤ', 'IDIETEROTIT', 'SPECIAL']):
-                rename_map[col] = 'ΙΔΙΑΙΤΕΡΟΤΗΤΑ'
-            elif any(x in col_clean for x in ['ΣΥΓΚΡΟΥΣ', 'SYGKROUS', 'CONFLICT']):
-                rename_map[col] = 'ΣΥΓΚΡΟΥΣΗ'
+            # Η πρώτη κανονική στήλη της οποίας κάποια παραλλαγή περιέχεται στο όνομα
+            for pattern, target in CANON_PATTERNS:
+                if pattern.search(col_clean):
+                    rename_map[col] = target
+                    break
         
         if rename_map:
             df = df.rename(columns=rename_map)
-            if st.session_state.debug_mode:
-                st.write("**DEBUG - Rename map:**", rename_map)
+            debug_info['rename_map'] = rename_map
         
-        # Κανονικοποίηση τιμών
+        # Κανονικοποίηση τιμών: ό,τι δεν αναγνωρίζεται ως Κ/Ν γίνεται Α/Ο
         if 'ΦΥΛΟ' in df.columns:
-            df['ΦΥΛΟ'] = df['ΦΥΛΟ'].astype(str).str.strip().str.upper()
-            gender_map = {
-                'Α': 'Α', 'ΑΓΟΡΙ': 'Α', 'ΑΓΟΡΙΟΥ': 'Α', 'BOY': 'Α', 'MALE': 'Α', 'M': 'Α',
-                'Κ': 'Κ', 'ΚΟΡΙΤΣΙ': 'Κ', 'ΚΟΡΙΤΣΙΟΥ': 'Κ', 'GIRL': 'Κ', 'FEMALE': 'Κ', 'F': 'Κ'
-            }
-            df['ΦΥΛΟ'] = df['ΦΥΛΟ'].map(gender_map).fillna('Α')
+            df['ΦΥΛΟ'] = _normalize_flag(df['ΦΥΛΟ'], GIRL_TOKENS, 'Κ', 'Α')
         
         # Κανονικοποίηση boolean στηλών
         bool_columns = ['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ', 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ', 'ΖΩΗΡΟΣ', 'ΙΔΙΑΙΤΕΡΟΤΗΤΑ']
         for col in bool_columns:
             if col in df.columns:
-                df[col] = df[col].astype(str).str.strip().str.upper()
-                bool_map = {
-                    'Ν': 'Ν', 'ΝΑΙ': 'Ν', 'YES': 'Ν', 'Y': 'Ν', '1': 'Ν', 'TRUE': 'Ν', 'T': 'Ν',
-                    'Ο': 'Ο', 'ΟΧΙ': 'Ο', 'NO': 'Ο', 'N': 'Ο', '0': 'Ο', 'FALSE': 'Ο', 'F': 'Ο'
-                }
-                df[col] = df[col].map(bool_map).fillna('Ο')
+                df[col] = _normalize_flag(df[col], YES_TOKENS, 'Ν', 'Ο')
         
         # Καθαρισμός ονομάτων
         if 'ΟΝΟΜΑ' in df.columns:
-            df['ΟΝΟΜΑ'] = df['ΟΝΟΜΑ'].astype(str).str.strip()
-            df = df[df['ΟΝΟΜΑ'] != ''].copy()
+            # Μία μάσκα για κενά και NaN ονόματα (StringDtype: το NaN μένει NA, δεν γίνεται 'nan')
+            names = df['ΟΝΟΜΑ'].astype('string').str.strip()
+            keep = (names.str.len() > 0).fillna(False).to_numpy(dtype=bool)
+            df = df.loc[keep].reset_index(drop=True)
+            df['ΟΝΟΜΑ'] = names.to_numpy()[keep]
+        
+        # Τελικοί τύποι (οι τιμές είναι ήδη κανονικοποιημένες, άρα όλες ανήκουν στις κατηγορίες)
+        df = df.astype({col: dtype for col, dtype in LOAD_DTYPES.items() if col in df.columns})
         
-        return df, None
+        return df, None, debug_info
         
     except Exception as e:
-        return None, f"Σφάλμα φόρτωσης: {str(e)}"
+        return None, f"Σφάλμα φόρτωσης: {str(e)}", debug_info
+
+def safe_load_data(uploaded_file) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """Ασφαλής φόρτωση και κανονικοποίηση δεδομένων"""
+    df, error, debug_info = _parse_bytes(_uploaded_file_key(uploaded_file), uploaded_file.getvalue(), uploaded_file.name)
+    
+    # Debug info
+    if st.session_state.debug_mode:
+        if 'columns' in debug_info:
+            st.write("**DEBUG - Αρχικές στήλες:**", debug_info['columns'])
+            st.write("**DEBUG - Shape:**", debug_info['shape'])
+        if debug_info.get('rename_map'):
+            st.write("**DEBUG - Rename map:**", debug_info['rename_map'])
+    
+    return df, error
+
+REQUIRED_COLUMNS = ("ΟΝΟΜΑ", "ΦΥΛΟ", "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ")
 
 def validate_required_columns(df: pd.DataFrame, debug_mode: bool = False) -> Tuple[bool, List[str]]:
     """Έλεγχος απαραίτητων στηλών"""
-    required_cols = ["ΟΝΟΜΑ", "ΦΥΛΟ", "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ", "ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ"]
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    required_cols = list(REQUIRED_COLUMNS)
+    # Ένα Index.difference (hash lookup) αντί για `in` ανά απαιτούμενη στήλη· κρατά τη σειρά των REQUIRED_COLUMNS
+    missing_cols = pd.Index(REQUIRED_COLUMNS).difference(df.columns, sort=False).tolist()
     
     if debug_mode:
         st.write(f"**DEBUG - Έλεγχος στηλών:**")
@@ -180,15 +228,93 @@ def validate_required_columns(df: pd.DataFrame, debug_mode: bool = False) -> Tup
     
     return len(missing_cols) == 0, missing_cols
 
+# Στήλες στατιστικών σεναρίου → (στήλη δεδομένων, τιμή που μετράται)
+SCENARIO_STAT_COLUMNS = {
+    'ΑΓΟΡΙΑ': ('ΦΥΛΟ', 'Α'),
+    'ΚΟΡΙΤΣΙΑ': ('ΦΥΛΟ', 'Κ'),
+    'ΕΚΠΑΙΔΕΥΤΙΚΟΙ': ('ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ', 'Ν'),
+    'ΖΩΗΡΟΙ': ('ΖΩΗΡΟΣ', 'Ν'),
+    'ΙΔΙΑΙΤΕΡΟΤΗΤΑ': ('ΙΔΙΑΙΤΕΡΟΤΗΤΑ', 'Ν'),
+    'ΓΝΩΣΗ ΕΛΛ.': ('ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ', 'Ν'),
+}
+
+def _attribute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """int8 δείκτες (1 = ο μαθητής μετράει) για κάθε στήλη του SCENARIO_STAT_COLUMNS"""
+    present = frozenset(df.columns)
+    indicators = {}
+    for stat_name, (col, value) in SCENARIO_STAT_COLUMNS.items():
+        if col not in present:
+            indicators[stat_name] = np.zeros(len(df), dtype=np.int8)
+            continue
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Σύγκριση πάνω στους ακέραιους κωδικούς της κατηγορίας, όχι σε strings
+            categories = series.cat.categories
+            code = categories.get_loc(value) if value in categories else -2
+            indicators[stat_name] = (series.cat.codes.to_numpy() == code).astype(np.int8)
+        else:
+            indicators[stat_name] = (series.to_numpy() == value).astype(np.int8)
+    return pd.DataFrame(indicators, index=df.index)
+
+def _attribute_totals(df: pd.DataFrame) -> Dict[str, int]:
+    """Σύνολα των δεικτών του SCENARIO_STAT_COLUMNS για όλο το DataFrame"""
+    return {name: int(total) for name, total in _attribute_indicators(df).sum().items()}
+
+# Προαιρετικό numba: ελέγχεται μόνο η ύπαρξη, η μεταγλώττιση γίνεται στην πρώτη χρήση
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+@st.cache_resource(show_spinner=False)
+def _tally_kernel():
+    """njit kernel για το _tally (None αν δεν υπάρχει numba)"""
+    if not NUMBA_AVAILABLE:
+        return None
+    import numba
+
+    # Σειριακό loop: με prange δύο μαθητές του ίδιου τμήματος θα έγραφαν ταυτόχρονα στην ίδια γραμμή
+    @numba.njit(cache=True)
+    def tally(codes, ind, n_groups):
+        out = np.zeros((n_groups, ind.shape[1]), dtype=np.int64)
+        for i in range(codes.size):
+            out[codes[i], :] += ind[i, :]
+        return out
+    return tally
+
+def _tally(codes: np.ndarray, ind: np.ndarray, n_groups: int) -> np.ndarray:
+    """Άθροισμα των int8 δεικτών `ind` ανά κωδικό τμήματος σε ένα πέρασμα → int64[n_groups, n_attrs]"""
+    kernel = _tally_kernel()
+    if kernel is not None:
+        return kernel(codes, ind, n_groups)
+    return np.column_stack([np.bincount(codes, weights=ind[:, j], minlength=n_groups)
+                            for j in range(ind.shape[1])]).astype(np.int64)
+
+def _scenario_stats_frame(df: pd.DataFrame, scenario_col: str) -> Optional[pd.DataFrame]:
+    """Πίνακας στατιστικών ανά τμήμα (None αν δεν υπάρχουν τοποθετημένοι μαθητές)"""
+    # Οι κωδικοί τμήματος κάνουν και το φιλτράρισμα: οι μη τοποθετημένοι (NaN) παίρνουν -1
+    codes, tmimata = pd.factorize(df[scenario_col], sort=True)
+    assigned = codes >= 0
+    if not assigned.any():
+        return None
+    codes = codes[assigned].astype(np.intp)
+    
+    # Όλες οι μετρήσεις ανά τμήμα σε ένα πέρασμα πάνω σε κωδικούς τμήματος και δείκτες 0/1
+    indicators = _attribute_indicators(df)
+    counts = _tally(codes, indicators.to_numpy(dtype=np.int8)[assigned], len(tmimata))
+    stats_df = pd.DataFrame(counts, columns=indicators.columns)
+    stats_df.insert(0, 'ΤΜΗΜΑ', np.asarray(tmimata))
+    stats_df['ΣΥΝΟΛΟ'] = np.bincount(codes, minlength=len(tmimata))
+    return stats_df
+
 def display_basic_info(df: pd.DataFrame, debug_mode: bool = False):
     """Εμφάνιση βασικών πληροφοριών"""
     st.subheader("📊 Βασικές Πληροφορίες")
     
     total_students = len(df)
-    boys_count = len(df[df['ΦΥΛΟ'] == 'Α']) if 'ΦΥΛΟ' in df.columns else 0
-    girls_count = len(df[df['ΦΥΛΟ'] == 'Κ']) if 'ΦΥΛΟ' in df.columns else 0
-    teachers_count = len(df[df['ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'] == 'Ν']) if 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ' in df.columns else 0
-    greek_count = len(df[df['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ'] == 'Ν']) if 'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ' in df.columns else 0
+    # Αθροίσματα πάνω στους int8 δείκτες αντί για φιλτράρισμα του DataFrame ανά τιμή
+    totals = _attribute_totals(df)
+    boys_count = int(totals['ΑΓΟΡΙΑ'])
+    girls_count = int(totals['ΚΟΡΙΤΣΙΑ'])
+    teachers_count = int(totals['ΕΚΠΑΙΔΕΥΤΙΚΟΙ'])
+    greek_count = int(totals['ΓΝΩΣΗ ΕΛΛ.'])
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -201,12 +327,14 @@ def display_basic_info(df: pd.DataFrame, debug_mode: bool = False):
         st.metric("Παιδιά Εκπαιδευτικών", teachers_count)
     
     if debug_mode:
+        present = frozenset(df.columns)
         st.write(f"**DEBUG - Αναλυτικά:**")
-        if 'ΦΥΛΟ' in df.columns:
+        if 'ΦΥΛΟ' in present:
             st.write(f"Φύλο: Α={boys_count}, Κ={girls_count}")
             st.write(f"Φύλο unique values: {df['ΦΥΛΟ'].unique()}")
-        if 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ' in df.columns:
-            teachers_list = df[df['ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'] == 'Ν']['ΟΝΟΜΑ'].tolist() if 'ΟΝΟΜΑ' in df.columns else []
+        if 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ' in present:
+            teachers_mask = df['ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'].to_numpy() == 'Ν'
+            teachers_list = df['ΟΝΟΜΑ'].to_numpy()[teachers_mask].tolist() if 'ΟΝΟΜΑ' in present else []
             st.write(f"Παιδιά εκπαιδευτικών: {teachers_count}")
             if teachers_list:
                 st.write(f"Ονόματα: {', '.join(teachers_list[:5])}{'...' if len(teachers_list) > 5 else ''}")
@@ -218,37 +346,12 @@ def display_scenario_statistics(df: pd.DataFrame, scenario_col: str, scenario_na
             st.warning(f"Η στήλη {scenario_col} δεν βρέθηκε")
             return None
             
-        df_assigned = df[df[scenario_col].notna()].copy()
-        if len(df_assigned) == 0:
+        stats_df = _scenario_stats_frame(df, scenario_col)
+        if stats_df is None:
             st.warning("Δεν βρέθηκαν τοποθετημένοι μαθητές")
             return None
             
         st.subheader(f"📊 Στατιστικά {scenario_name}")
-        
-        # Χειροκίνητη δημιουργία στατιστικών για αξιοπιστία
-        stats_data = []
-        for tmima in sorted(df_assigned[scenario_col].unique()):
-            subset = df_assigned[df_assigned[scenario_col] == tmima]
-            
-            boys = len(subset[subset['ΦΥΛΟ'] == 'Α']) if 'ΦΥΛΟ' in subset.columns else 0
-            girls = len(subset[subset['ΦΥΛΟ'] == 'Κ']) if 'ΦΥΛΟ' in subset.columns else 0
-            educators = len(subset[subset['ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ'] == 'Ν']) if 'ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ' in subset.columns else 0
-            energetic = len(subset[subset['ΖΩΗΡΟΣ'] == 'Ν']) if 'ΖΩΗΡΟΣ' in subset.columns else 0
-            special = len(subset[subset['ΙΔΙΑΙΤΕΡΟΤΗΤΑ'] == 'Ν']) if 'ΙΔΙΑΙΤΕΡΟΤΗΤΑ' in subset.columns else 0
-            greek = len(subset[subset['ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ'] == 'Ν']) if 'ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ' in subset.columns else 0
-            
-            stats_data.append({
-                'ΤΜΗΜΑ': tmima,
-                'ΑΓΟΡΙΑ': boys,
-                'ΚΟΡΙΤΣΙΑ': girls,
-                'ΕΚΠΑΙΔΕΥΤΙΚΟΙ': educators,
-                'ΖΩΗΡΟΙ': energetic,
-                'ΙΔΙΑΙΤΕΡΟΤΗΤΑ': special,
-                'ΓΝΩΣΗ ΕΛΛ.': greek,
-                'ΣΥΝΟΛΟ': len(subset)
-            })
-        
-        stats_df = pd.DataFrame(stats_data)
         st.dataframe(stats_df, use_container_width=True)
         
         return stats_df
@@ -259,6 +362,63 @@ def display_scenario_statistics(df: pd.DataFrame, scenario_col: str, scenario_na
             st.code(traceback.format_exc())
         return None
 
+# Παράμετροι του βήματος 2 όπως το τρέχει το app: ορίζουν τις τιμές των ΒΗΜΑ2_ στηλών,
+# άρα μπαίνουν στο κλειδί cache των επόμενων βημάτων (_step_cache_key)
+STEP2_SEED = 42  # το προεπιλεγμένο seed του step2_apply_FIXED_v3
+STEP2_MAX_SCENARIOS = 3
+STEP2_SCENARIO_INDEX = 0  # συνεχίζουμε με το πρώτο σενάριο
+
+def _step_cache_key(df: pd.DataFrame) -> Tuple:
+    """Φθηνό κλειδί cache για την είσοδο ενός βήματος: ό,τι ορίζει τις τιμές του df, χωρίς hash του ίδιου"""
+    # Τα βήματα 1-4 είναι ντετερμινιστικά, οπότε οι τιμές του df ορίζονται από το upload, τον αριθμό
+    # τμημάτων, τη στήλη βήματος 1 που τροφοδότησε το βήμα 2 και τις παραμέτρους του βήματος 2.
+    # Κάθε νέα παράμετρος που αλλάζει τα αποτελέσματα πρέπει να μπει κι εδώ.
+    return (st.session_state.get('data_key'), st.session_state.get('num_classes'),
+            st.session_state.get('step2_source_column'),
+            (STEP2_SEED, STEP2_MAX_SCENARIOS, STEP2_SCENARIO_INDEX),
+            tuple(map(str, df.columns)))
+
+# Τα βήματα 1, 3 και 4 είναι ντετερμινιστικά: ίδιο upload + ίδιες παράμετροι → ίδιο αποτέλεσμα
+# (τα _df/_num_classes δεν γίνονται hash· το κλειδί είναι το cache_key, που περιέχει και το num_classes)
+@st.cache_data(show_spinner=False, max_entries=4)
+def _step1_core(cache_key: Tuple, _df: pd.DataFrame, _num_classes: Optional[int]) -> Tuple[pd.DataFrame, Any]:
+    return _lazy_step('create_immutable_step1')(_df, _num_classes)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _step3_core(cache_key: Tuple, _df: pd.DataFrame, _num_classes: Optional[int]) -> pd.DataFrame:
+    return _lazy_step('apply_step3_to_dataframe')(_df, _num_classes)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _step4_core(cache_key: Tuple, _df: pd.DataFrame, assigned_column: str) -> pd.DataFrame:
+    return _lazy_step('run_step4_complete')(_df, assigned_column)
+
+def _columns_by_prefix(df: pd.DataFrame) -> Dict[str, List[str]]:
+    """Στήλες ομαδοποιημένες ανά πρόθεμα πριν το πρώτο '_' (π.χ. 'ΒΗΜΑ3'), σε ένα πέρασμα"""
+    prefix_map: Dict[str, List[str]] = {}
+    for col in df.columns:
+        prefix, sep, _ = str(col).partition('_')
+        if sep:
+            prefix_map.setdefault(prefix, []).append(col)
+    return prefix_map
+
+def _scenario_cols(df: pd.DataFrame, prefix: str) -> List[str]:
+    """Στήλες του df που ξεκινούν με `prefix` (ένας vectorized έλεγχος σε όλο το Index)"""
+    columns = df.columns
+    return columns[columns.astype(str).str.startswith(prefix)].tolist()
+
+def _display_table(step_data: Dict[str, Any]) -> Any:
+    """Arrow πίνακας του step για το st.dataframe, υπολογισμένος μία φορά ανά αποτέλεσμα"""
+    if 'arrow' not in step_data:
+        table = step_data['df']
+        if ARROW_AVAILABLE:
+            try:
+                table = pa.Table.from_pandas(step_data['df'], preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                # Μικτοί τύποι σε object στήλες: το Streamlit κάνει τη δική του μετατροπή
+                pass
+        step_data['arrow'] = table
+    return step_data['arrow']
+
 def run_step1(df: pd.DataFrame, num_classes: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], Optional[Any]]:
     """Εκτέλεση Βήματος 1 - Immutable"""
     if not STEP1_AVAILABLE:
@@ -268,24 +428,21 @@ def run_step1(df: pd.DataFrame, num_classes: Optional[int] = None) -> Tuple[Opti
     try:
         st.subheader("🎯 Βήμα 1: Παιδιά Εκπαιδευτικών")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Εκτέλεση Βήματος 1...")
-        progress_bar.progress(50)
+        # Ένα progress widget με ενσωματωμένο κείμενο αντί για progress + st.empty
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 1...")
         
         # Χρήση του immutable step1 module
-        df_step1, step1_results = create_immutable_step1(df, num_classes)
+        df_step1, step1_results = _step1_core(_step_cache_key(df), df, num_classes)
         
-        progress_bar.progress(100)
-        status_text.text("✅ Βήμα 1 ολοκληρώθηκε επιτυχώς!")
+        progress_bar.progress(100, text="✅ Βήμα 1 ολοκληρώθηκε επιτυχώς!")
         
         # Αποθήκευση στο session state
         st.session_state.step1_results = step1_results
         
-        # Αποθήκευση αναλυτικών βημάτων
+        # Αποθήκευση αναλυτικών βημάτων: κάθε στήλη δείχνει στο ίδιο DataFrame
+        # (τα επόμενα βήματα κάνουν copy πριν τροποποιήσουν, οπότε δεν χρειάζεται αντίγραφο)
         for scenario in step1_results.scenarios:
-            st.session_state.detailed_steps[scenario.column_name] = df_step1.copy()
+            st.session_state.detailed_steps[scenario.column_name] = df_step1
         
         st.success(f"Δημιουργήθηκαν {len(step1_results.scenarios)} σενάρια")
         
@@ -311,46 +468,35 @@ def run_step2(df_step1: pd.DataFrame, step1_column: str) -> Optional[pd.DataFram
     try:
         st.subheader("⚡ Βήμα 2: Ζωηροί & Ιδιαιτερότητες")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 2...")
         
-        status_text.text("Εκτέλεση Βήματος 2...")
-        progress_bar.progress(50)
+        # Εκτέλεση step2 στη μνήμη (χωρίς ενδιάμεσα αρχεία Excel), με seed STEP2_SEED.
+        # Τα βήματα 3-4 κάνουν cache με κλειδί _step_cache_key: η στήλη εισόδου και οι παράμετροι
+        # του βήματος 2 (seed, max_scenarios, επιλεγμένο σενάριο) είναι μέρος του κλειδιού.
+        step2_scenarios = _lazy_step('run_step2_with_lock_df')(
+            df_step1,
+            step1_column=step1_column,
+            max_scenarios=STEP2_MAX_SCENARIOS
+        )
+        st.session_state.step2_source_column = step1_column
         
-        # Χρήση temporary directory για το step2
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Αποθήκευση προσωρινού αρχείου
-            temp_file = Path(temp_dir) / "temp_step1.xlsx"
-            df_step1.to_excel(temp_file, index=False)
+        if step2_scenarios:
+            # Επιλογή σεναρίου (το πρώτο)
+            df_step2 = list(step2_scenarios.values())[STEP2_SCENARIO_INDEX]
             
-            # Εκτέλεση step2
-            run_step2_with_lock(
-                input_file=str(temp_file),
-                step1_column=step1_column,
-                output_dir=temp_dir,
-                max_scenarios=3
-            )
+            # Αποθήκευση αναλυτικών βημάτων
+            step2_cols = [col for col in df_step2.columns if col.startswith('ΒΗΜΑ2_') or col.startswith('ΤΕΛΙΚΟ_')]
+            if step2_cols:
+                st.session_state.detailed_steps[step2_cols[0]] = df_step2
+            
+            progress_bar.progress(100, text="✅ Βήμα 2 ολοκληρώθηκε επιτυχώς!")
+            
+            st.success(f"Βήμα 2: Επιτυχής ολοκλήρωση με {len(step2_scenarios)} σενάρια")
+            return df_step2
+        else:
+            st.error("Δεν βρέθηκαν αποτελέσματα από το Βήμα 2")
+            return None
             
-            # Φόρτωση αποτελεσμάτων
-            result_files = list(Path(temp_dir).glob("step2_locked_scenario_*.xlsx"))
-            if result_files:
-                # Επιλογή πρώτου σεναρίου
-                df_step2 = pd.read_excel(result_files[0])
-                
-                # Αποθήκευση αναλυτικών βημάτων
-                step2_cols = [col for col in df_step2.columns if col.startswith('ΒΗΜΑ2_') or col.startswith('ΤΕΛΙΚΟ_')]
-                if step2_cols:
-                    st.session_state.detailed_steps[step2_cols[0]] = df_step2.copy()
-                
-                progress_bar.progress(100)
-                status_text.text("✅ Βήμα 2 ολοκληρώθηκε επιτυχώς!")
-                
-                st.success(f"Βήμα 2: Επιτυχής ολοκλήρωση με {len(result_files)} σενάρια")
-                return df_step2
-            else:
-                st.error("Δεν βρέθηκαν αποτελέσματα από το Βήμα 2")
-                return None
-                
     except Exception as e:
         st.error(f"Σφάλμα στο Βήμα 2: {e}")
         if st.session_state.debug_mode:
@@ -366,22 +512,17 @@ def run_step3(df_step2: pd.DataFrame, num_classes: Optional[int] = None) -> Opti
     try:
         st.subheader("💫 Βήμα 3: Αμοιβαίες Φιλίες")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Εκτέλεση Βήματος 3...")
-        progress_bar.progress(50)
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 3...")
         
         # Εφαρμογή Βήματος 3
-        df_step3 = apply_step3_to_dataframe(df_step2, num_classes)
+        df_step3 = _step3_core(_step_cache_key(df_step2), df_step2, num_classes)
         
         # Αποθήκευση αναλυτικών βημάτων
         step3_cols = [col for col in df_step3.columns if col.startswith('ΒΗΜΑ3_')]
         for col in step3_cols:
-            st.session_state.detailed_steps[col] = df_step3.copy()
+            st.session_state.detailed_steps[col] = df_step3
         
-        progress_bar.progress(100)
-        status_text.text("✅ Βήμα 3 ολοκληρώθηκε επιτυχώς!")
+        progress_bar.progress(100, text="✅ Βήμα 3 ολοκληρώθηκε επιτυχώς!")
         
         st.success("Βήμα 3: Επιτυχής ολοκλήρωση")
         return df_step3
@@ -401,21 +542,16 @@ def run_step4(df_step3: pd.DataFrame, assigned_column: str) -> Optional[pd.DataF
     try:
         st.subheader("👥 Βήμα 4: Φιλικές Ομάδες")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 4...")
         
-        status_text.text("Εκτέλεση Βήματος 4...")
-        progress_bar.progress(50)
-        
-        df_step4 = run_step4_complete(df_step3, assigned_column)
+        df_step4 = _step4_core(_step_cache_key(df_step3), df_step3, assigned_column)
         
         # Αποθήκευση αναλυτικών βημάτων
         step4_cols = [col for col in df_step4.columns if col.startswith('ΒΗΜΑ4_')]
         for col in step4_cols:
-            st.session_state.detailed_steps[col] = df_step4.copy()
+            st.session_state.detailed_steps[col] = df_step4
         
-        progress_bar.progress(100)
-        status_text.text("✅ Βήμα 4 ολοκληρώθηκε επιτυχώς!")
+        progress_bar.progress(100, text="✅ Βήμα 4 ολοκληρώθηκε επιτυχώς!")
         
         st.success("Βήμα 4: Επιτυχής ολοκλήρωση")
         return df_step4
@@ -435,26 +571,21 @@ def run_step5(df_step4: pd.DataFrame, scenario_col: str) -> Tuple[Optional[pd.Da
     try:
         st.subheader("🔄 Βήμα 5: Υπόλοιποι Μαθητές")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Εκτέλεση Βήματος 5...")
-        progress_bar.progress(50)
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 5...")
         
         # Χρήση ενός σεναρίου για απλότητα
         scenarios_dict = {"ΣΕΝΑΡΙΟ_1": df_step4}
         
-        best_df, best_penalty, best_scenario = apply_step5_to_all_scenarios(
+        best_df, best_penalty, best_scenario = _lazy_step('apply_step5_to_all_scenarios')(
             scenarios_dict, scenario_col
         )
         
         # Αποθήκευση αναλυτικών βημάτων
         step5_cols = [col for col in best_df.columns if col.startswith('ΒΗΜΑ5_')]
         for col in step5_cols:
-            st.session_state.detailed_steps[col] = best_df.copy()
+            st.session_state.detailed_steps[col] = best_df
         
-        progress_bar.progress(100)
-        status_text.text("✅ Βήμα 5 ολοκληρώθηκε επιτυχώς!")
+        progress_bar.progress(100, text="✅ Βήμα 5 ολοκληρώθηκε επιτυχώς!")
         
         st.success(f"Βήμα 5: Επιλέχθηκε {best_scenario} με penalty score: {best_penalty}")
         return best_df, best_penalty
@@ -474,16 +605,12 @@ def run_step6(df_step5: pd.DataFrame) -> Optional[Dict]:
     try:
         st.subheader("🔍 Βήμα 6: Τελικός Έλεγχος")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Εκτέλεση Βήματος 6...")
-        progress_bar.progress(50)
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 6...")
         
         # Χρήση ενός σεναρίου για απλότητα
         step5_outputs = {"ΣΕΝΑΡΙΟ_1": df_step5}
         
-        results = apply_step6_to_step5_scenarios(step5_outputs)
+        results = _lazy_step('apply_step6_to_step5_scenarios')(step5_outputs)
         
         if "ΣΕΝΑΡΙΟ_1" in results:
             result = results["ΣΕΝΑΡΙΟ_1"]
@@ -492,10 +619,9 @@ def run_step6(df_step5: pd.DataFrame) -> Optional[Dict]:
             df_step6 = result['df']
             step6_cols = [col for col in df_step6.columns if col.startswith('ΒΗΜΑ6_')]
             for col in step6_cols:
-                st.session_state.detailed_steps[col] = df_step6.copy()
+                st.session_state.detailed_steps[col] = df_step6
             
-            progress_bar.progress(100)
-            status_text.text("✅ Βήμα 6 ολοκληρώθηκε επιτυχώς!")
+            progress_bar.progress(100, text="✅ Βήμα 6 ολοκληρώθηκε επιτυχώς!")
             
             summary = result.get('summary', {})
             status = summary.get('status', 'Completed')
@@ -521,24 +647,19 @@ def run_step7(df_step6: pd.DataFrame) -> Optional[Dict]:
     try:
         st.subheader("🏆 Βήμα 7: Τελικό Score")
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("Εκτέλεση Βήματος 7...")
-        progress_bar.progress(50)
+        progress_bar = st.progress(50, text="Εκτέλεση Βήματος 7...")
         
         # Εύρεση στήλης σεναρίου
-        scenario_cols = [col for col in df_step6.columns if col.startswith('ΒΗΜΑ6_')]
-        if not scenario_cols:
-            scenario_cols = ['ΒΗΜΑ6_ΤΜΗΜΑ', 'ΤΜΗΜΑ']
-            scenario_cols = [col for col in scenario_cols if col in df_step6.columns]
-        
-        if scenario_cols:
-            result = pick_best_scenario(df_step6, scenario_cols[:1])
-            scores_df = score_to_dataframe(df_step6, scenario_cols[:1])
+        # Χρειάζεται μόνο η πρώτη κατάλληλη στήλη
+        scenario_col = next((col for col in df_step6.columns if col.startswith('ΒΗΜΑ6_')), None)
+        if scenario_col is None:
+            scenario_col = next((col for col in ('ΒΗΜΑ6_ΤΜΗΜΑ', 'ΤΜΗΜΑ') if col in df_step6.columns), None)
+        
+        if scenario_col is not None:
+            result = _lazy_step('pick_best_scenario')(df_step6, [scenario_col])
+            scores_df = _lazy_step('score_to_dataframe')(df_step6, [scenario_col])
             
-            progress_bar.progress(100)
-            status_text.text("✅ Βήμα 7 ολοκληρώθηκε επιτυχώς!")
+            progress_bar.progress(100, text="✅ Βήμα 7 ολοκληρώθηκε επιτυχώς!")
             
             st.success("Βήμα 7: Υπολογισμός τελικού score ολοκληρώθηκε")
             return {"result": result, "scores": scores_df}
@@ -552,12 +673,40 @@ def run_step7(df_step6: pd.DataFrame) -> Optional[Dict]:
             st.code(traceback.format_exc())
         return None
 
+# Μέγιστος αριθμός γραμμών που στέλνονται στο front-end πριν ζητηθεί πλήρης προβολή
+PREVIEW_ROWS = 1000
+
+# st.fragment (Streamlit >= 1.37) / st.experimental_fragment (>= 1.33): rerun μόνο του τμήματος
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+@_fragment
+def display_step_results(step_names: List[str]):
+    """Εμφάνιση αποτελεσμάτων μόνο για το επιλεγμένο βήμα"""
+    labels = [f"Βήμα {i+1}" for i in range(len(step_names))]
+    selected = st.radio("Βήμα", labels, horizontal=True, key='active_tab', label_visibility='collapsed')
+    step_name = step_names[labels.index(selected)]
+    
+    step_data = st.session_state.results[step_name]
+    if isinstance(step_data, dict) and 'df' in step_data:
+        df_step = step_data['df']
+        st.subheader(f"📋 {step_name.upper()}")
+        
+        table = _display_table(step_data)
+        show_full = False
+        if len(df_step) > PREVIEW_ROWS:
+            show_full = st.toggle(f"Εμφάνιση όλων των {len(df_step)} γραμμών", key=f"show_full_{step_name}")
+        if not show_full:
+            table = table.slice(0, PREVIEW_ROWS) if ARROW_AVAILABLE and isinstance(table, pa.Table) else table.head(PREVIEW_ROWS)
+        
+        st.dataframe(table, use_container_width=True)
+        st.info(f"Σύνολο: {len(df_step)} εγγραφές, Στήλες: {len(df_step.columns)}")
+
 def create_detailed_steps_workbook():
     """Δημιουργία Excel workbook με όλα τα αναλυτικά βήματα"""
     try:
         excel_buffer = io.BytesIO()
         
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+        with pd.ExcelWriter(excel_buffer, **excel_writer_kwargs()) as writer:
             # Ταξινόμηση των βημάτων για σωστή σειρά
             step_order = ['ΒΗΜΑ1', 'ΒΗΜΑ2', 'ΒΗΜΑ3', 'ΒΗΜΑ4', 'ΒΗΜΑ5', 'ΒΗΜΑ6', 'ΒΗΜΑ7']
             
@@ -574,7 +723,7 @@ def create_detailed_steps_workbook():
                 
                 for sheet_name, df in sheets_for_step:
                     # Περιορισμός μήκους ονόματος sheet (Excel limit)
-                    safe_sheet_name = sheet_name[:31] if len(sheet_name) > 31 else sheet_name
+                    safe_sheet_name = sheet_name[:31]
                     df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
                     sheets_written += 1
             
@@ -596,7 +745,8 @@ def create_detailed_steps_workbook():
         
         excel_buffer.seek(0)
         st.success(f"Δημιουργήθηκαν {sheets_written} sheets με αναλυτικά βήματα")
-        return excel_buffer.getvalue()
+        # Επιστρέφεται το ίδιο το buffer (το download_button δέχεται file-like), χωρίς αντίγραφο bytes
+        return excel_buffer
         
     except Exception as e:
         st.error(f"Σφάλμα στη δημιουργία αναλυτικών βημάτων: {e}")
@@ -604,35 +754,31 @@ def create_detailed_steps_workbook():
             st.code(traceback.format_exc())
         return None
 
-def export_to_excel(dataframes_dict: Dict[str, pd.DataFrame], filename: str = "ΑΝΑΛΥΤΙΚΑ_ΒΗΜΑΤΑ.xlsx") -> bytes:
+def export_to_excel(dataframes_dict: Dict[str, pd.DataFrame], filename: str = "ΑΝΑΛΥΤΙΚΑ_ΒΗΜΑΤΑ.xlsx") -> io.BytesIO:
     """Εξαγωγή πολλαπλών DataFrames σε Excel με διαφορετικά sheets"""
     output = io.BytesIO()
     
     try:
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        # xlsxwriter (με τα XLSXWRITER_OPTIONS) αν υπάρχει, αλλιώς openpyxl
+        with pd.ExcelWriter(output, **excel_writer_kwargs()) as writer:
             for sheet_name, df in dataframes_dict.items():
                 # Περιορισμός μήκους ονόματος sheet
-                safe_sheet_name = sheet_name[:31] if len(sheet_name) > 31 else sheet_name
+                safe_sheet_name = sheet_name[:31]
                 df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
     except ImportError:
-        try:
-            # Fallback σε xlsxwriter
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                for sheet_name, df in dataframes_dict.items():
-                    safe_sheet_name = sheet_name[:31] if len(sheet_name) > 31 else sheet_name
-                    df.to_excel(writer, sheet_name=safe_sheet_name, index=False)
-        except ImportError:
-            st.warning("Δεν βρέθηκε Excel engine. Εξαγωγή σε CSV format.")
-            import zipfile
-            output = io.BytesIO()
-            with zipfile.ZipFile(output, 'w') as zip_file:
-                for sheet_name, df in dataframes_dict.items():
-                    csv_buffer = io.StringIO()
-                    df.to_csv(csv_buffer, index=False, encoding='utf-8')
-                    zip_file.writestr(f"{sheet_name}.csv", csv_buffer.getvalue())
-            return output.getvalue()
+        st.warning("Δεν βρέθηκε Excel engine. Εξαγωγή σε CSV format.")
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w') as zip_file:
+            for sheet_name, df in dataframes_dict.items():
+                # Το CSV γράφεται κατευθείαν στο entry του zip, χωρίς ενδιάμεσο string
+                with zip_file.open(f"{sheet_name}.csv", 'w', force_zip64=True) as entry, \
+                        io.TextIOWrapper(entry, encoding='utf-8', newline='') as csv_stream:
+                    df.to_csv(csv_stream, index=False)
+        output.seek(0)
+        return output
     
-    return output.getvalue()
+    output.seek(0)
+    return output
 
 def main():
     """Κύρια συνάρτηση της εφαρμογής"""
@@ -655,7 +801,7 @@ def main():
         
         num_classes = st.number_input("Αριθμός Τμημάτων", 
                                     min_value=2, max_value=10, 
-                                    value=None,
+                                    value=None, key='num_classes',
                                     help="Αφήστε κενό για αυτόματο υπολογισμό")
         
         run_all_steps = st.checkbox("Εκτέλεση όλων των βημάτων", value=True)
@@ -677,6 +823,7 @@ def main():
                     st.error(f"❌ {error}")
                     return
                 st.session_state.data = df_original
+                st.session_state.data_key = _uploaded_file_key(uploaded_file)
         
         df_original = st.session_state.data
         
@@ -729,7 +876,7 @@ def main():
                         
                         # Βήμα 2
                         with st.status("Βήμα 2: Ζωηροί & Ιδιαιτερότητες", expanded=True) as status:
-                            step1_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ1_ΣΕΝΑΡΙΟ_')]
+                            step1_columns = _scenario_cols(current_df, 'ΒΗΜΑ1_ΣΕΝΑΡΙΟ_')
                             if step1_columns:
                                 df_step2 = run_step2(current_df, step1_columns[0])
                                 if df_step2 is not None:
@@ -754,11 +901,10 @@ def main():
                         
                         # Βήμα 4
                         with st.status("Βήμα 4: Φιλικές Ομάδες", expanded=True) as status:
-                            step3_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ3_')]
-                            if not step3_columns:
-                                step3_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ2_')]
-                            if not step3_columns:
-                                step3_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ1_')]
+                            prefix_map = _columns_by_prefix(current_df)
+                            step3_columns = (prefix_map.get('ΒΗΜΑ3')
+                                             or prefix_map.get('ΒΗΜΑ2')
+                                             or prefix_map.get('ΒΗΜΑ1'))
                             
                             if step3_columns:
                                 df_step4 = run_step4(current_df, step3_columns[0])
@@ -773,11 +919,10 @@ def main():
                         
                         # Βήμα 5
                         with st.status("Βήμα 5: Υπόλοιποι Μαθητές", expanded=True) as status:
-                            step4_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ4_')]
-                            if not step4_columns:
-                                step4_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ3_')]
-                            if not step4_columns:
-                                step4_columns = [col for col in current_df.columns if col.startswith('ΒΗΜΑ2_')]
+                            prefix_map = _columns_by_prefix(current_df)
+                            step4_columns = (prefix_map.get('ΒΗΜΑ4')
+                                             or prefix_map.get('ΒΗΜΑ3')
+                                             or prefix_map.get('ΒΗΜΑ2'))
                             
                             if step4_columns:
                                 df_step5, penalty5 = run_step5(current_df, step4_columns[0])
@@ -836,7 +981,7 @@ def main():
                 with col2:
                     if st.button("2️⃣ Βήμα 2") and 'step1' in st.session_state.results:
                         df_step1 = st.session_state.results['step1']['df']
-                        step1_columns = [col for col in df_step1.columns if col.startswith('ΒΗΜΑ1_ΣΕΝΑΡΙΟ_')]
+                        step1_columns = _scenario_cols(df_step1, 'ΒΗΜΑ1_ΣΕΝΑΡΙΟ_')
                         if step1_columns:
                             df_step2 = run_step2(df_step1, step1_columns[0])
                             if df_step2 is not None:
@@ -854,20 +999,10 @@ def main():
         st.markdown("---")
         st.header("📊 Αποτελέσματα")
         
-        # Tabs για κάθε βήμα
-        available_steps = list(st.session_state.results.keys())
+        # Επιλογή βήματος: σειριοποιείται μόνο το ενεργό βήμα και όχι όλα τα tabs
+        available_steps = list(st.session_state.results.keys())[:7]
         if available_steps:
-            tabs = st.tabs([f"Βήμα {i+1}" for i in range(min(len(available_steps), 7))])
-            
-            for i, step_name in enumerate(available_steps[:7]):
-                if i < len(tabs):
-                    with tabs[i]:
-                        step_data = st.session_state.results[step_name]
-                        if isinstance(step_data, dict) and 'df' in step_data:
-                            df_step = step_data['df']
-                            st.subheader(f"📋 {step_name.upper()}")
-                            st.dataframe(df_step, use_container_width=True)
-                            st.info(f"Σύνολο: {len(df_step)} εγγραφές, Στήλες: {len(df_step.columns)}")
+            display_step_results(available_steps)
         
         # Τελικά στατιστικά
         if 'final_df' in st.session_state.results:
@@ -911,7 +1046,7 @@ def main():
         # Αναλυτικά βήματα
         if st.button("📋 Αναλυτικά Βήματα (VIMA6 Format)"):
             detailed_excel = create_detailed_steps_workbook()
-            if detailed_excel:
+            if detailed_excel is not None:
                 st.download_button(
                     label="⬇️ Λήψη Αναλυτικών Βημάτων",
                     data=detailed_excel,
@@ -5,21 +5,21 @@
 """
 import pandas as pd
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import sys
 
-# Imports από τα existing modules
-from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
+# Imports από τα existing modules (ο αλγόριθμος βήματος 2 φορτώνεται στην πρώτη εκτέλεση)
 from step2_finalize import finalize_step2_assignments, validate_final_assignments, lock_step2_results
+from excel_engine import excel_read_engine, excel_writer_kwargs
 
 
 def load_excel_data(file_path: str, sheet_name: str = None) -> pd.DataFrame:
     """Φόρτωση Excel με error handling"""
     try:
         if sheet_name:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
+            df = pd.read_excel(file_path, sheet_name=sheet_name, engine=excel_read_engine())
         else:
-            df = pd.read_excel(file_path)
+            df = pd.read_excel(file_path, engine=excel_read_engine())
         print(f"✅ Φορτώθηκαν {len(df)} εγγραφές από {file_path}")
         return df
     except Exception as e:
@@ -27,43 +27,21 @@ def load_excel_data(file_path: str, sheet_name: str = None) -> pd.DataFrame:
         sys.exit(1)
 
 
-def run_step2_with_lock(
-    input_file: str,
+def _lock_scenarios(
+    df: pd.DataFrame,
     step1_column: str,
-    output_dir: str = "output",
-    max_scenarios: int = 3,
-    sheet_name: str = None
-) -> None:
+    max_scenarios: int
+) -> List[Tuple[int, str, Dict[str, Any], pd.DataFrame, Dict[str, Any]]]:
     """
-    Εκτελεί βήμα 2 και κλειδώνει τα αποτελέσματα.
+    Εκτελεί βήμα 2 και κλειδώνει κάθε σενάριο στη μνήμη.
     
-    Args:
-        input_file: Path του Excel/CSV αρχείου
-        step1_column: Όνομα στήλης βήματος 1 (π.χ. "ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1")
-        output_dir: Φάκελος εξόδου
-        max_scenarios: Μέγιστος αριθμός σεναρίων
-        sheet_name: Όνομα sheet (αν Excel)
+    Returns:
+        Λίστα (αύξων αριθμός, όνομα σεναρίου, metrics, κλειδωμένο DataFrame, lock stats)
     """
+    from step_2_zoiroi_idiaterotites_FIXED_v3_PATCHED import step2_apply_FIXED_v3
     
-    # Δημιουργία output directory
-    Path(output_dir).mkdir(exist_ok=True)
-    
-    # Φόρτωση δεδομένων
-    print(f"📁 Φόρτωση από {input_file}")
-    if input_file.endswith('.csv'):
-        df = pd.read_csv(input_file)
-    else:
-        df = load_excel_data(input_file, sheet_name)
-    
-    print(f"📊 Βρέθηκαν στήλες: {list(df.columns)}")
-    
-    # Έλεγχος ύπαρξης step1 column
-    if step1_column not in df.columns:
-        print(f"❌ Η στήλη '{step1_column}' δεν βρέθηκε!")
-        print(f"Διαθέσιμες στήλες: {list(df.columns)}")
-        sys.exit(1)
-    
-    # Εκτέλεση βήματος 2
+    # Εκτέλεση βήματος 2 (με το προεπιλεγμένο seed=42 του step2_apply_FIXED_v3· το main_app
+    # κάνει cache τα βήματα 3-4 με το seed στο κλειδί, βλ. main_app.STEP2_SEED / _step_cache_key)
     print(f"\n🔄 Εκτέλεση βήματος 2 βάσει στήλης '{step1_column}'")
     scenarios = step2_apply_FIXED_v3(
         df, 
@@ -72,11 +50,11 @@ def run_step2_with_lock(
     )
     
     if not scenarios:
-        print("❌ Δεν βρέθηκαν σενάρια!")
-        sys.exit(1)
+        return []
     
     print(f"✅ Βρέθηκαν {len(scenarios)} σενάρια")
     
+    locked = []
     # Επεξεργασία κάθε σεναρίου
     for i, (scenario_name, scenario_df, metrics) in enumerate(scenarios, 1):
         print(f"\n📋 Σενάριο {i}: {scenario_name}")
@@ -110,29 +88,120 @@ def run_step2_with_lock(
         else:
             print(f"   ❌ {validation['students_without_assignment']} παιδιά χωρίς τμήμα!")
         
+        locked.append((i, scenario_name, metrics, final_df, lock_stats))
+    
+    return locked
+
+
+def run_step2_with_lock_df(
+    df: pd.DataFrame,
+    step1_column: str,
+    max_scenarios: int = 3
+) -> Dict[str, pd.DataFrame]:
+    """
+    Εκτελεί βήμα 2 και κλειδώνει τα αποτελέσματα χωρίς ενδιάμεσα αρχεία.
+    
+    Args:
+        df: DataFrame με αποτελέσματα βήματος 1
+        step1_column: Όνομα στήλης βήματος 1 (π.χ. "ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1")
+        max_scenarios: Μέγιστος αριθμός σεναρίων
+    
+    Returns:
+        Dict {όνομα σεναρίου: κλειδωμένο DataFrame}, με τη σειρά των σεναρίων
+    """
+    if step1_column not in df.columns:
+        raise ValueError(f"Η στήλη '{step1_column}' δεν βρέθηκε! Διαθέσιμες στήλες: {list(df.columns)}")
+    
+    # Το βήμα 1 σημειώνει τους μη τοποθετημένους με "", ενώ το βήμα 2 αναγνωρίζει μόνο NaN
+    # (όπως έβγαιναν από το ενδιάμεσο Excel): τα κενά γίνονται NaN σε shallow copy
+    step1_values = df[step1_column]
+    blank = step1_values.astype(str).str.strip().eq("") & step1_values.notna()
+    if blank.any():
+        df = df.copy(deep=False)
+        df[step1_column] = step1_values.mask(blank)
+    
+    locked = _lock_scenarios(df, step1_column, max_scenarios)
+    return {scenario_name: final_df for _, scenario_name, _, final_df, _ in locked}
+
+
+def run_step2_with_lock(
+    input_file: str,
+    step1_column: str,
+    output_dir: str = "output",
+    max_scenarios: int = 3,
+    sheet_name: str = None
+) -> List[Path]:
+    """
+    Εκτελεί βήμα 2 και κλειδώνει τα αποτελέσματα.
+    
+    Args:
+        input_file: Path του Excel/CSV αρχείου
+        step1_column: Όνομα στήλης βήματος 1 (π.χ. "ΒΗΜΑ1_ΣΕΝΑΡΙΟ_1")
+        output_dir: Φάκελος εξόδου
+        max_scenarios: Μέγιστος αριθμός σεναρίων
+        sheet_name: Όνομα sheet (αν Excel)
+    
+    Returns:
+        Λίστα με τα paths των αρχείων step2_locked_scenario_N.xlsx που γράφτηκαν
+        (ο caller δεν χρειάζεται να σαρώσει τον φάκελο)
+    """
+    
+    # Δημιουργία output directory
+    Path(output_dir).mkdir(exist_ok=True)
+    
+    # Φόρτωση δεδομένων
+    print(f"📁 Φόρτωση από {input_file}")
+    if input_file.endswith('.csv'):
+        df = pd.read_csv(input_file)
+    else:
+        df = load_excel_data(input_file, sheet_name)
+    
+    print(f"📊 Βρέθηκαν στήλες: {list(df.columns)}")
+    
+    # Έλεγχος ύπαρξης step1 column
+    if step1_column not in df.columns:
+        print(f"❌ Η στήλη '{step1_column}' δεν βρέθηκε!")
+        print(f"Διαθέσιμες στήλες: {list(df.columns)}")
+        sys.exit(1)
+    
+    locked = _lock_scenarios(df, step1_column, max_scenarios)
+    if not locked:
+        print("❌ Δεν βρέθηκαν σενάρια!")
+        sys.exit(1)
+    
+    output_files = []
+    for i, scenario_name, metrics, final_df, lock_stats in locked:
         # Αποθήκευση
         output_file = Path(output_dir) / f"step2_locked_scenario_{i}.xlsx"
-        final_df.to_excel(output_file, index=False)
+        with pd.ExcelWriter(output_file, **excel_writer_kwargs()) as writer:
+            final_df.to_excel(writer, index=False)
+        output_files.append(output_file)
         print(f"   💾 Αποθηκεύτηκε: {output_file}")
         
         # Αποθήκευση summary
         summary_file = Path(output_dir) / f"step2_summary_scenario_{i}.txt"
+        # Όλο το summary χτίζεται στη μνήμη και γράφεται με ένα write
+        parts = [
+            f"ΣΕΝΑΡΙΟ {i} - {scenario_name}\n",
+            "="*50 + "\n\n",
+            "ΜΕΤΡΙΚΕΣ ΒΗΜΑΤΟΣ 2:\n",
+            f"- Παιδαγωγικές συγκρούσεις: {metrics['ped_conflicts']}\n",
+            f"- Σπασμένες φιλίες: {metrics['broken']}\n",
+            f"- Συνολικό penalty: {metrics['penalty']}\n\n",
+            "ΚΛΕΙΔΩΜΑ:\n",
+            f"- Συνολικά παιδιά: {lock_stats['total_students']}\n",
+            f"- Ήδη τοποθετημένα: {lock_stats['already_placed']}\n",
+            f"- Νέες τοποθετήσεις: {lock_stats['newly_placed']}\n\n",
+            "ΚΑΤΑΝΟΜΗ ΤΜΗΜΑΤΩΝ:\n",
+        ]
+        parts.extend(f"- {class_name}: {count} παιδιά\n"
+                     for class_name, count in sorted(lock_stats['class_distribution'].items()))
         with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write(f"ΣΕΝΑΡΙΟ {i} - {scenario_name}\n")
-            f.write("="*50 + "\n\n")
-            f.write("ΜΕΤΡΙΚΕΣ ΒΗΜΑΤΟΣ 2:\n")
-            f.write(f"- Παιδαγωγικές συγκρούσεις: {metrics['ped_conflicts']}\n")
-            f.write(f"- Σπασμένες φιλίες: {metrics['broken']}\n")
-            f.write(f"- Συνολικό penalty: {metrics['penalty']}\n\n")
-            f.write("ΚΛΕΙΔΩΜΑ:\n")
-            f.write(f"- Συνολικά παιδιά: {lock_stats['total_students']}\n")
-            f.write(f"- Ήδη τοποθετημένα: {lock_stats['already_placed']}\n")
-            f.write(f"- Νέες τοποθετήσεις: {lock_stats['newly_placed']}\n\n")
-            f.write("ΚΑΤΑΝΟΜΗ ΤΜΗΜΑΤΩΝ:\n")
-            for class_name, count in sorted(lock_stats['class_distribution'].items()):
-                f.write(f"- {class_name}: {count} παιδιά\n")
+            f.write("".join(parts))
         
         print(f"   📄 Summary: {summary_file}")
+    
+    return output_files
 
 
 if __name__ == "__main__":
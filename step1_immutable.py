@@ -69,12 +69,13 @@ class Step1Results:
                 raise ValueError(f"Λείπει στήλη {col_name} - παραβίαση immutability")
             
             # Έλεγχος ότι οι αναθέσεις είναι οι αναμενόμενες
+            # (όνομα → τιμή της πρώτης γραμμής με αυτό το όνομα, ένα hash map αντί για σάρωση ανά μαθητή)
+            class_by_name = dict(zip(df["ΟΝΟΜΑ"].to_numpy()[::-1], df[col_name].to_numpy()[::-1]))
             for student_name, expected_class in scenario.assignments.items():
-                student_row = df[df["ΟΝΟΜΑ"] == student_name]
-                if student_row.empty:
+                if student_name not in class_by_name:
                     continue
                 
-                actual_class = student_row[col_name].iloc[0]
+                actual_class = class_by_name[student_name]
                 if pd.notna(actual_class) and str(actual_class).strip() != expected_class:
                     raise ValueError(
                         f"ΠΑΡΑΒΙΑΣΗ IMMUTABILITY: {student_name} σε {col_name} "
@@ -146,13 +147,10 @@ class Step1ImmutableProcessor:
         # Προσθήκη στηλών ΒΗΜΑ1_ΣΕΝΑΡΙΟ_X
         for scenario in self._results.scenarios:
             col_name = scenario.column_name
-            result_df[col_name] = ""  # Αρχικοποίηση με κενές τιμές
-            
-            # Συμπλήρωση μόνο για παιδιά εκπαιδευτικών
-            for student_name, class_assigned in scenario.assignments.items():
-                mask = result_df["ΟΝΟΜΑ"] == student_name
-                if mask.any():
-                    result_df.loc[mask, col_name] = class_assigned
+            # Συμπλήρωση μόνο για παιδιά εκπαιδευτικών, κενές τιμές για τους υπόλοιπους
+            # (ένα map ονόματος → τμήματος αντί για μία σάρωση της στήλης ανά μαθητή)
+            assignments = dict(scenario.assignments)
+            result_df[col_name] = result_df["ΟΝΟΜΑ"].map(assignments).fillna("").astype(object)
         
         # ΚΛΕΙΔΩΜΑ - μετά από αυτό δεν επιτρέπονται αλλαγές
         self._is_locked = True
@@ -3,10 +3,48 @@
 Κλείδωμα αποτελεσμάτων βήματος 2 - Όλα τα παιδιά παίρνουν οριστικό τμήμα
 """
 from typing import Optional, Tuple
+import functools
+import importlib.util
+import numpy as np
 import pandas as pd
 import re
 import math
 
+_SCENARIO_RE = re.compile(r'ΣΕΝΑΡΙΟ[_\s]*(\d+)')
+
+# Έτοιμα ονόματα τμημάτων για τη δημιουργία από το μηδέν (σπάνια χρειάζονται πάνω από ~40)
+_CLASS_NAMES = tuple(f"Α{i+1}" for i in range(64))
+
+# Προαιρετικό numba: φορτώνεται μόνο όταν χρειαστεί ο kernel (μεγάλα πλήθη unplaced)
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+_NUMBA_MIN_UNPLACED = 10_000
+
+@functools.lru_cache(maxsize=1)
+def _fill_cyclic_kernel():
+    """njit kernel για το κυκλικό γέμισμα (None αν δεν υπάρχει numba)"""
+    if not NUMBA_AVAILABLE:
+        return None
+    import numba
+
+    @numba.njit(cache=True)
+    def fill_cyclic(codes, mask, classes_codes):
+        j = 0
+        n = classes_codes.size
+        for i in range(codes.size):
+            if mask[i]:
+                codes[i] = classes_codes[j % n]
+                j += 1
+    return fill_cyclic
+
+def _fill_cyclic(codes: np.ndarray, mask: np.ndarray, classes_codes: np.ndarray, count: int) -> None:
+    """Γράφει κυκλικά τους `classes_codes` στις θέσεις `mask` του `codes` (in place)"""
+    kernel = _fill_cyclic_kernel() if count >= _NUMBA_MIN_UNPLACED else None
+    if kernel is not None:
+        kernel(codes, mask, classes_codes)
+    else:
+        # np.resize επαναλαμβάνει κυκλικά τον πίνακα μέχρι το μήκος count (χωρίς arange/modulo)
+        codes[mask] = np.resize(classes_codes, count)
+
 def finalize_step2_assignments(
     df: pd.DataFrame, 
     step2_col: str,
@@ -26,54 +64,71 @@ def finalize_step2_assignments(
     """
     if final_col_name is None:
         # Εξάγουμε το ID από το step2_col για συνέπεια
-        match = re.search(r'ΣΕΝΑΡΙΟ[_\s]*(\d+)', str(step2_col))
+        match = _SCENARIO_RE.search(str(step2_col))
         scenario_id = match.group(1) if match else "1"
         final_col_name = f"ΤΕΛΙΚΟ_ΤΜΗΜΑ_ΣΕΝΑΡΙΟ_{scenario_id}"
     
-    result_df = df.copy()
+    # Βρίσκουμε όσα ακόμα δεν έχουν τμήμα (NaN) — μία numpy μάσκα πάνω στο αρχικό df,
+    # πριν από οποιοδήποτε αντίγραφο
+    values = df[step2_col].to_numpy()
+    unplaced_mask = pd.isna(values)
+    unplaced_count = int(unplaced_mask.sum())
     
-    # Ξεκινάμε με τα αποτελέσματα του βήματος 2
-    result_df[final_col_name] = result_df[step2_col].copy()
-    
-    # Βρίσκουμε όσα ακόμα δεν έχουν τμήμα (NaN)
-    unplaced_mask = pd.isna(result_df[final_col_name])
-    unplaced_count = unplaced_mask.sum()
+    # Shallow copy: μοιράζεται τα buffers των υπαρχουσών στηλών (διαβάζονται μόνο)
+    result_df = df.copy(deep=False)
     
     if unplaced_count == 0:
-        # Όλα ήδη τοποθετημένα
+        # Όλα ήδη τοποθετημένα: η τελική στήλη είναι κατευθείαν Categorical του βήματος 2
+        # (το pd.Categorical ταξινομεί τις κατηγορίες όπου γίνεται, π.χ. όχι για [1, 'Α1'])
+        final_values = pd.Categorical(values)
+        result_df[final_col_name] = final_values
         stats = {
             "total_students": len(result_df),
             "already_placed": len(result_df),
             "newly_placed": 0,
-            "class_distribution": result_df[final_col_name].value_counts().to_dict()
+            "class_distribution": pd.Series(final_values).value_counts().to_dict()
         }
         return result_df, stats
     
     # Υπολογίζουμε την κατανομή των υπαρχόντων τμημάτων
-    placed_classes = result_df[~unplaced_mask][final_col_name].value_counts()
-    available_classes = sorted(placed_classes.index.tolist())
-    
-    if not available_classes:
-        # Αν δεν υπάρχουν καθόλου τμήματα, δημιουργούμε βάσει συνολικού αριθμού
-        num_classes = max(2, math.ceil(len(result_df) / 25))
-        available_classes = [f"Α{i+1}" for i in range(num_classes)]
-        placed_classes = pd.Series([0] * len(available_classes), index=available_classes)
+    placed_counts = df[step2_col][~unplaced_mask].value_counts()
+    available_classes = sorted(placed_counts.index.tolist())
+    placed_classes = {cls: int(count) for cls, count in placed_counts.items()}
     
     # Στρατηγική: ισοκατανομή των unplaced στα υπάρχοντα τμήματα
     # Προτεραιότητα στα τμήματα με λιγότερα παιδιά
-    unplaced_names = result_df[unplaced_mask]["ΟΝΟΜΑ"].tolist()
-    
-    # Ταξινομούμε τα τμήματα από λιγότερα προς περισσότερα μέλη
-    classes_by_size = placed_classes.sort_values().index.tolist()
-    
-    # Κατανέμουμε τα unplaced παιδιά cyclically
-    for i, student_name in enumerate(unplaced_names):
-        target_class = classes_by_size[i % len(classes_by_size)]
-        student_idx = result_df[result_df["ΟΝΟΜΑ"] == student_name].index[0]
-        result_df.loc[student_idx, final_col_name] = target_class
-    
-    # Στατιστικά
-    final_distribution = result_df[final_col_name].value_counts().to_dict()
+    if available_classes:
+        # Ταξινομούμε τα τμήματα από λιγότερα προς περισσότερα μέλη· ίδιο value_counts + sort_values
+        # με την αρχική υλοποίηση, ώστε και τα ισόπαλα τμήματα να μένουν στην ίδια σειρά
+        classes_by_size = placed_counts.sort_values().index.to_numpy(dtype=object)
+    else:
+        # Αν δεν υπάρχουν καθόλου τμήματα, δημιουργούμε βάσει συνολικού αριθμού
+        # (όλα άδεια, άρα η σειρά μεγέθους είναι απλώς η σειρά των ονομάτων)
+        num_classes = max(2, math.ceil(len(result_df) / 25))
+        if num_classes <= len(_CLASS_NAMES):
+            available_classes = list(_CLASS_NAMES[:num_classes])
+        else:
+            available_classes = [f"Α{i+1}" for i in range(num_classes)]
+        classes_by_size = np.array(available_classes, dtype=object)
+    
+    # Categorical με σταθερές κατηγορίες: counts και εγγραφές γίνονται πάνω σε ακέραιους κωδικούς
+    class_dtype = pd.CategoricalDtype(available_classes)
+    codes = pd.Categorical(values, dtype=class_dtype).codes.copy()
+    
+    # Κατανέμουμε τα unplaced παιδιά cyclically, με τη σειρά των γραμμών·
+    # οι κωδικοί γράφονται κατευθείαν στον numpy πίνακα, χωρίς το .loc του pandas
+    cycle_codes = class_dtype.categories.get_indexer(classes_by_size).astype(codes.dtype)
+    _fill_cyclic(codes, unplaced_mask, cycle_codes, unplaced_count)
+    result_df[final_col_name] = pd.Categorical.from_codes(codes, dtype=class_dtype)
+    
+    # Στατιστικά: η τελική κατανομή = αρχικά μεγέθη + ο κυκλικός μερισμός (χωρίς νέο value_counts).
+    # Τα πρώτα `rem` τμήματα του κύκλου παίρνουν ένα παιδί παραπάνω.
+    base, rem = divmod(int(unplaced_count), len(classes_by_size))
+    final_distribution = dict(placed_classes)
+    for j, cls in enumerate(classes_by_size):
+        added = base + (1 if j < rem else 0)
+        if added:
+            final_distribution[cls] = final_distribution.get(cls, 0) + added
     stats = {
         "total_students": len(result_df),
         "already_placed": len(result_df) - unplaced_count,
@@ -93,17 +148,22 @@ def validate_final_assignments(df: pd.DataFrame, final_col: str) -> dict:
     Returns:
         Dict με validation metrics
     """
+    # Ένα isna και ένα value_counts, που επαναχρησιμοποιούνται σε όλες τις μετρικές
+    col = df[final_col]
+    n_missing = int(col.isna().to_numpy().sum())
+    class_sizes = col.value_counts()
+    class_sizes = class_sizes[class_sizes > 0]  # categorical: μόνο τμήματα με παιδιά
+    
     validation = {
         "total_students": len(df),
-        "students_with_assignment": (~pd.isna(df[final_col])).sum(),
-        "students_without_assignment": pd.isna(df[final_col]).sum(),
-        "is_complete": pd.isna(df[final_col]).sum() == 0,
-        "unique_classes": df[final_col].nunique(),
-        "class_list": sorted(df[final_col].dropna().unique().tolist())
+        "students_with_assignment": len(col) - n_missing,
+        "students_without_assignment": n_missing,
+        "is_complete": n_missing == 0,
+        "unique_classes": len(class_sizes),
+        "class_list": sorted(class_sizes.index.tolist())
     }
     
     if validation["is_complete"]:
-        class_sizes = df[final_col].value_counts()
         validation.update({
             "min_class_size": class_sizes.min(),
             "max_class_size": class_sizes.max(),
@@ -70,17 +70,19 @@ def _infer_num_classes_from_values(vals: Iterable[str]) -> int:
 
 def _counts_per_class(df: pd.DataFrame, scenario_col: str, label_filter=None) -> Dict[str, int]:
     """Γενικός μετρητής ανά τμήμα."""
-    labels = sorted([c for c in df[scenario_col].dropna().astype(str).unique() if re.match(r"^Α\d+$", str(c))])
-    res = {lab: 0 for lab in labels}
-    if label_filter is None:
-        for lab in labels:
-            res[lab] = int((df[scenario_col] == lab).sum())
-        return res
-    # label_filter είναι συνάρτηση που δέχεται row και επιστρέφει bool
-    mask = df.apply(label_filter, axis=1)
-    for lab in labels:
-        res[lab] = int(((df[scenario_col] == lab) & mask).sum())
-    return res
+    col = df[scenario_col]
+    keys = col.astype(str)
+    is_label = (col.notna() & keys.str.match(r"^Α\d+$")).to_numpy(dtype=bool)
+    labels = sorted(keys[is_label].unique())
+    if not labels:
+        return {}
+    selected = is_label
+    if label_filter is not None:
+        # label_filter είναι συνάρτηση που δέχεται row και επιστρέφει bool
+        selected = is_label & df.apply(label_filter, axis=1).to_numpy(dtype=bool)
+    # Ένα value_counts για όλα τα τμήματα αντί για μία σύγκριση στήλης ανά τμήμα
+    counts = keys[selected].value_counts()
+    return {lab: int(counts.get(lab, 0)) for lab in labels}
 
 def _boys_filter(row) -> bool:
     return _norm_str(row.get("ΦΥΛΟ")) == "Α"
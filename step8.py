@@ -23,6 +23,8 @@ from collections import defaultdict
 
 import pandas as pd
 
+from excel_engine import excel_read_engine, excel_writer_kwargs
+
 
 STEP6_SCEN_RE = r"^ΒΗΜΑ6_ΣΕΝΑΡΙΟ_\d+$"
 NAME_CANDIDATES = [
@@ -127,7 +129,7 @@ def build_best_only_workbook(step6_xlsx_path: str, step7_py_path: str, out_xlsx_
     επιλέγοντας ανάμεσα σε σενάρια Βήματος 6 και με τυχαίο tie-break.
     """
     step7 = _load_step7(step7_py_path)
-    xls6 = pd.ExcelFile(step6_xlsx_path)
+    xls6 = pd.ExcelFile(step6_xlsx_path, engine=excel_read_engine())
 
     # Συλλογή όλων των υποψηφίων για συνολική επιλογή best
     candidates = []
@@ -175,8 +177,8 @@ def build_best_only_workbook(step6_xlsx_path: str, step7_py_path: str, out_xlsx_
     class_col = "ΤΕΛΙΚΟ_ΤΜΗΜΑ" if "ΤΕΛΙΚΟ_ΤΜΗΜΑ" in df_best.columns else best_col
     class_to_names = _group_names_by_class(df_best, class_col=class_col, name_col=name_col)
 
-    # Γράψιμο Excel
-    with pd.ExcelWriter(out_xlsx_path, engine="xlsxwriter") as writer:
+    # Γράψιμο Excel (xlsxwriter με τα κοινά XLSXWRITER_OPTIONS αν υπάρχει, αλλιώς openpyxl)
+    with pd.ExcelWriter(out_xlsx_path, **excel_writer_kwargs()) as writer:
         # 1) BEST_SCENARIO (full table)
         df_best.to_excel(writer, index=False, sheet_name="BEST_SCENARIO")
 
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Κλείδωμα βήματος 2: ίδια κατανομή με την αρχική υλοποίηση (και στις ισοπαλίες)
+"""
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from step2_finalize import finalize_step2_assignments  # noqa: E402
+
+
+def _reference_finalize(df: pd.DataFrame, step2_col: str, final_col: str) -> pd.Series:
+    """Η αρχική υλοποίηση: value_counts + sort_values και κυκλική εγγραφή ανά μαθητή"""
+    result = df[step2_col].copy()
+    unplaced_mask = pd.isna(result)
+    placed_classes = result[~unplaced_mask].value_counts()
+    if placed_classes.empty:
+        num_classes = max(2, math.ceil(len(df) / 25))
+        labels = [f"Α{i+1}" for i in range(num_classes)]
+        placed_classes = pd.Series([0] * num_classes, index=labels)
+    classes_by_size = placed_classes.sort_values().index.tolist()
+    for i, idx in enumerate(result.index[unplaced_mask]):
+        result.loc[idx] = classes_by_size[i % len(classes_by_size)]
+    return result.rename(final_col)
+
+
+@pytest.mark.parametrize("placed", [
+    # Ισόπαλα Α1/Α2 (1 παιδί) με διαφορετική σειρά εμφάνισης
+    ["Α3"] * 4 + ["Α4"] * 3 + ["Α2", "Α1"],
+    ["Α2", "Α3", "Α4", "Α1", "Α3", "Α4", "Α3", "Α4", "Α3"],
+    ["Α1", "Α2", "Α3"] * 3,
+    [],
+])
+def test_finalize_matches_reference(placed):
+    values = placed + [None] * 7
+    df = pd.DataFrame({
+        "ΟΝΟΜΑ": [f"Μαθητής {i + 1}" for i in range(len(values))],
+        "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1": pd.Series(values, dtype=object),
+    })
+
+    result_df, stats = finalize_step2_assignments(df, "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1")
+
+    final_col = "ΤΕΛΙΚΟ_ΤΜΗΜΑ_ΣΕΝΑΡΙΟ_1"
+    expected = _reference_finalize(df, "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1", final_col)
+    assert result_df[final_col].astype(object).tolist() == expected.tolist()
+    assert stats["class_distribution"] == expected.value_counts().to_dict()
+    assert stats["newly_placed"] == 7
+
+
+@pytest.mark.parametrize("placed", [
+    ["Α2", "Α1", "Α2"],
+    # Μικτοί τύποι (π.χ. αριθμός από το Excel): δεν ταξινομούνται, αλλά δεν πρέπει να σκάει
+    [1, "Α1"],
+])
+def test_finalize_all_placed_matches_reference(placed):
+    df = pd.DataFrame({
+        "ΟΝΟΜΑ": [f"Μαθητής {i + 1}" for i in range(len(placed))],
+        "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1": pd.Series(placed, dtype=object),
+    })
+
+    result_df, stats = finalize_step2_assignments(df, "ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1")
+
+    assert result_df["ΤΕΛΙΚΟ_ΤΜΗΜΑ_ΣΕΝΑΡΙΟ_1"].astype(object).tolist() == placed
+    assert stats["class_distribution"] == df["ΒΗΜΑ2_ΣΕΝΑΡΙΟ_1"].value_counts().to_dict()
+    assert stats["newly_placed"] == 0
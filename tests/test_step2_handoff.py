@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Παράδοση βήματος 1 → βήμα 2 στη μνήμη (χωρίς ενδιάμεσο Excel)
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from step1_immutable import create_immutable_step1  # noqa: E402
+from main_step2_with_lock import run_step2_with_lock_df  # noqa: E402
+
+
+def _roster(n: int = 60) -> pd.DataFrame:
+    """Roster με 4 παιδιά εκπαιδευτικών και λίγους ζωηρούς / με ιδιαιτερότητα"""
+    return pd.DataFrame({
+        "ΟΝΟΜΑ": [f"Μαθητής {i + 1}" for i in range(n)],
+        "ΦΥΛΟ": ["Α" if i % 2 else "Κ" for i in range(n)],
+        "ΚΑΛΗ_ΓΝΩΣΗ_ΕΛΛΗΝΙΚΩΝ": ["Ν" if i % 5 else "Ο" for i in range(n)],
+        "ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ": ["Ν" if i < 4 else "Ο" for i in range(n)],
+        "ΖΩΗΡΟΣ": ["Ν" if i in (10, 20, 30, 40) else "Ο" for i in range(n)],
+        "ΙΔΙΑΙΤΕΡΟΤΗΤΑ": ["Ν" if i in (15, 35) else "Ο" for i in range(n)],
+        "ΦΙΛΟΙ": [""] * n,
+        "ΣΥΓΚΡΟΥΣΗ": [""] * n,
+    })
+
+
+def test_step1_output_runs_through_step2():
+    df_step1, results = create_immutable_step1(_roster())
+    step1_column = results.scenarios[0].column_name
+    # Οι μη τοποθετημένοι του βήματος 1 έρχονται ως "" και όχι NaN
+    assert (df_step1[step1_column] == "").any()
+
+    locked = run_step2_with_lock_df(df_step1, step1_column, max_scenarios=2)
+
+    assert locked
+    for final_df in locked.values():
+        final_col = next(col for col in final_df.columns if col.startswith("ΤΕΛΙΚΟ_"))
+        assert final_df[final_col].notna().all()
+        # Τα παιδιά εκπαιδευτικών κρατούν το τμήμα του βήματος 1
+        teacher_kids = df_step1["ΠΑΙΔΙ_ΕΚΠΑΙΔΕΥΤΙΚΟΥ"] == "Ν"
+        assert (final_df.loc[teacher_kids, final_col].astype(str)
+                == df_step1.loc[teacher_kids, step1_column].astype(str)).all()